@@ -1,14 +1,57 @@
 """
-Activity logging (Phase 2): read shell history and append to logs/device_<hostname>_<date>.json.
-Format: { "type": "command", "timestamp": "ISO", "command": "...", "cwd": "..." }
+Activity logging (Phase 2): read shell history and append to logs/device_<hostname>_<date>.msgpack
+(a stream of msgpack frames).
+Entry: { "type": "command", "timestamp": "ISO", "command": "...", "cwd": "..." }
+Older logs are read too: device_*.jsonl (one JSON per line) and device_*.json (a single JSON array).
 """
-import json
+import atexit
+import functools
+import hashlib
 import os
 import socket
-from datetime import datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
 from pathlib import Path
+from typing import Any, BinaryIO, Iterator
 
+import msgpack
 
+from . import jsonio
+
+# Suffix of the log this device appends to; every suffix in _LOG_SUFFIXES is readable
+_LOG_SUFFIX = ".msgpack"
+_LOG_SUFFIXES = (".msgpack", ".jsonl", ".json")
+
+# Today's log stays open for the session; syncs append + flush, fsync is batched (flush_logs)
+_log_lock = threading.Lock()
+_log_fh: BinaryIO | None = None
+_log_dirty = False
+
+# Single worker so syncs never run concurrently; drained at exit so pending appends land
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="activity_logger")
+
+
+def _close_log() -> None:
+    """fsync and close the open log handle, if any."""
+    global _log_fh
+    flush_logs()
+    with _log_lock:
+        if _log_fh is not None:
+            _log_fh.close()
+            _log_fh = None
+
+
+# atexit runs last-registered first: drain the executor, then close the log
+atexit.register(_close_log)
+atexit.register(_executor.shutdown, wait=True)
+
+
+# Bytes before the cursor offset that must be unchanged for a history file to count as appended to
+_FINGERPRINT_BYTES = 4096
+
+
+@functools.lru_cache(maxsize=1)
 def _hostname() -> str:
     try:
         return socket.gethostname() or "unknown"
@@ -16,25 +59,165 @@ def _hostname() -> str:
         return "unknown"
 
 
-def _today_iso() -> str:
-    return datetime.now().strftime("%Y-%m-%d")
+@functools.lru_cache(maxsize=4)
+def _date_iso(day: date) -> str:
+    return day.strftime("%Y-%m-%d")
+
+
+def _today_iso(now: datetime | None = None) -> str:
+    return _date_iso((now or datetime.now()).date())
+
+
+def _log_path(logs_dir: Path, day_iso: str | None = None) -> Path:
+    return logs_dir / f"device_{_hostname()}_{day_iso or _today_iso()}{_LOG_SUFFIX}"
+
+
+def _encode_entry(entry: dict) -> bytes:
+    """One appendable log frame (a msgpack object)."""
+    return msgpack.packb(entry)
+
+
+def _iter_frames(f: BinaryIO) -> Iterator[tuple[Any, int]]:
+    """Yield (object, offset just past it) for each whole msgpack frame; stops at a torn or corrupt one."""
+    unpacker = msgpack.Unpacker(f, raw=False)
+    while True:
+        try:
+            item = unpacker.unpack()
+        except msgpack.OutOfData:
+            return
+        except (ValueError, TypeError):
+            return
+        yield item, unpacker.tell()
+
+
+def _drop_torn_tail(log_path: Path) -> None:
+    """
+    Truncate log_path after its last whole frame. A msgpack stream has no resync point: frames
+    appended after a torn one (crash or power loss mid-write) would never be readable.
+    """
+    try:
+        with open(log_path, "r+b") as f:
+            end = 0
+            for _, end in _iter_frames(f):
+                pass
+            if end < os.fstat(f.fileno()).st_size:
+                f.truncate(end)
+    except FileNotFoundError:
+        return
+
+
+def _append_log(log_path: Path, data: bytes) -> None:
+    """Append to log_path through the session handle (reopened when the day's log changes)."""
+    global _log_fh, _log_dirty
+    with _log_lock:
+        if _log_fh is not None and _log_fh.name != str(log_path):
+            _log_fh.flush()
+            os.fsync(_log_fh.fileno())
+            _log_fh.close()
+            _log_fh = None
+        if _log_fh is None:
+            _drop_torn_tail(log_path)
+            _log_fh = open(log_path, "ab", buffering=64 * 1024)
+        _log_fh.write(data)
+        # Flush to the OS so dedup and the indexer see the lines; fsync waits for flush_logs
+        _log_fh.flush()
+        _log_dirty = True
+
+
+def flush_logs() -> None:
+    """fsync appended log lines to disk. Cheap no-op when nothing was written since the last call."""
+    global _log_dirty
+    with _log_lock:
+        if _log_fh is None or not _log_dirty:
+            return
+        _log_fh.flush()
+        os.fsync(_log_fh.fileno())
+        _log_dirty = False
+
+
+def _iter_log_entries(path: Path) -> Iterator[dict]:
+    """
+    Yield entries from a .msgpack, .jsonl (one object per line) or legacy .json array log.
+    Unreadable parts are skipped: a torn msgpack tail, bad JSON lines, an invalid .json file.
+    Raises OSError if the file cannot be read.
+    """
+    if path.suffix == ".msgpack":
+        with open(path, "rb") as f:
+            for item, _ in _iter_frames(f):
+                if isinstance(item, dict):
+                    yield item
+        return
+    if path.suffix == ".json":
+        try:
+            data = jsonio.loads(path.read_bytes())
+        except ValueError:
+            return
+        if isinstance(data, list):
+            yield from (item for item in data if isinstance(item, dict))
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                item = jsonio.loads(line)
+            except ValueError:
+                # Partially written last line (e.g. interrupted sync); skip it
+                continue
+            if isinstance(item, dict):
+                yield item
 
 
-def _log_path(logs_dir: Path) -> Path:
-    return logs_dir / f"device_{_hostname()}_{_today_iso()}.json"
+def _cursor_path(logs_dir: Path) -> Path:
+    return logs_dir / f"cursor_{_hostname()}.json"
 
 
-def _read_lines(path: Path, encoding: str = "utf-8", errors: str = "replace") -> list[str]:
+def _load_cursor(logs_dir: Path) -> dict[str, list]:
+    """Per history file: [mtime_ns, size, offset, fingerprint] as of the last sync. {} if missing or invalid."""
+    path = _cursor_path(logs_dir)
     if not path.exists():
-        return []
+        return {}
     try:
-        return path.read_text(encoding=encoding, errors=errors).strip().splitlines()
+        data = jsonio.loads(path.read_bytes())
+        return data if isinstance(data, dict) else {}
+    except (ValueError, OSError):
+        return {}
+
+
+def _iter_lines(path: Path, offset: int = 0, encoding: str = "utf-8", errors: str = "replace") -> Iterator[str]:
+    """Yield lines of a (possibly multi-MB) history file from byte offset without loading it whole."""
+    try:
+        with open(path, "rb") as f:
+            if offset:
+                f.seek(offset)
+            for line in f:
+                yield line.decode(encoding, errors)
     except OSError:
-        return []
+        return
 
 
-def _shell_history_paths() -> list[Path]:
-    """Paths to shell history files (newest first for dedup)."""
+def _tail_fingerprint(path: Path, offset: int) -> str | None:
+    """
+    Hash of the (up to) _FINGERPRINT_BYTES before offset, or None if offset is not just after a newline.
+    Tells an appended-to history file from one rewritten in place (bash trims it to HISTFILESIZE).
+    """
+    if offset <= 0:
+        return None
+    start = max(0, offset - _FINGERPRINT_BYTES)
+    try:
+        with open(path, "rb") as f:
+            f.seek(start)
+            tail = f.read(offset - start)
+    except OSError:
+        return None
+    if len(tail) != offset - start or not tail.endswith(b"\n"):
+        return None
+    return hashlib.blake2b(tail, digest_size=16).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _shell_history_paths() -> tuple[Path, ...]:
+    """Paths to shell history files (newest first for dedup). Cached; see refresh_shell_history_paths."""
     home = Path.home()
     paths = []
     # Unix: .zsh_history, .bash_history
@@ -44,85 +227,117 @@ def _shell_history_paths() -> list[Path]:
     appdata = os.environ.get("APPDATA")
     if appdata:
         paths.append(Path(appdata) / "Microsoft" / "Windows" / "PowerShell" / "PSReadLine" / "ConsoleHost_history.txt")
-    return [p for p in paths if p.exists()]
+    return tuple(p for p in paths if p.is_file())
 
 
-def _existing_commands(log_path: Path) -> set[str]:
-    """Set of already-logged command strings (for dedup)."""
-    if not log_path.exists():
-        return set()
-    try:
-        data = json.loads(log_path.read_text(encoding="utf-8"))
-        if isinstance(data, list):
-            return {item.get("command", "").strip() for item in data if isinstance(item, dict)}
-        return set()
-    except Exception:
-        return set()
+def refresh_shell_history_paths() -> None:
+    """Re-detect shell history files on the next sync (e.g. a shell was used for the first time)."""
+    _shell_history_paths.cache_clear()
+
+
+def _command_key(cmd: str) -> bytes:
+    """8-byte digest of a command; dedup sets hold these instead of full command strings."""
+    return hashlib.blake2b(cmd.encode("utf-8", errors="replace"), digest_size=8).digest()
+
+
+def _existing_commands(log_path: Path) -> set[bytes]:
+    """Digests of already-logged commands (for dedup). Includes today's logs in other formats, if any."""
+    existing: set[bytes] = set()
+    for path in (log_path.with_suffix(suffix) for suffix in _LOG_SUFFIXES):
+        if not path.exists():
+            continue
+        try:
+            existing.update(_command_key(str(item.get("command", "")).strip()) for item in _iter_log_entries(path))
+        except OSError:
+            continue
+    return existing
 
 
 def sync_terminal_history(logs_dir: Path, cwd_fallback: str = "") -> int:
     """
-    Read shell history files, append new commands to logs/device_<hostname>_<date>.json.
+    Read shell history files, append new commands to today's logs/device_<hostname>_<date> log.
     Returns number of new commands appended. Deduplicates by command text.
+    Only bytes added since the last sync are read (cursor_<hostname>.json in logs_dir); a file
+    that was rewritten rather than appended to is read again from the start.
     """
-    log_path = _log_path(logs_dir)
+    now = datetime.now()
+    log_path = _log_path(logs_dir, _today_iso(now))
     existing = _existing_commands(log_path)
     new_entries = []
-    now_iso = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    now_iso = now.replace(microsecond=0).isoformat()
+    cwd = cwd_fallback or str(Path.cwd())
+    cursor = _load_cursor(logs_dir)
+    new_cursor: dict[str, list] = {}
 
     for hist_path in _shell_history_paths():
-        for line in _read_lines(hist_path):
+        try:
+            st = hist_path.stat()
+        except OSError:
+            continue
+        saved = cursor.get(str(hist_path))
+        if not (isinstance(saved, list) and len(saved) == 4):
+            saved = None
+        if saved and saved[0] == st.st_mtime_ns and saved[1] == st.st_size:
+            new_cursor[str(hist_path)] = saved
+            continue
+        new_cursor[str(hist_path)] = [st.st_mtime_ns, st.st_size, st.st_size,
+                                      _tail_fingerprint(hist_path, st.st_size)]
+        # Appended to (same bytes still before the old offset): read only the new suffix.
+        # Shrunk or rewritten in place (e.g. trimmed to HISTFILESIZE): read it all again.
+        offset = 0
+        if saved and saved[3] and st.st_size >= saved[2] and _tail_fingerprint(hist_path, saved[2]) == saved[3]:
+            offset = saved[2]
+        for line in _iter_lines(hist_path, offset):
             cmd = line.strip()
-            # Skip empty and very long lines; skip if already logged
+            # Skip empty and very long lines (before any zsh parsing); skip if already logged
             if not cmd or len(cmd) > 2000:
                 continue
             # Some shells prefix with timestamp (e.g. zsh); use last part as command for dedup
-            if cmd.startswith(": ") and ":" in cmd[2:]:
-                # zsh format: ": 1234567890:0;command"
-                idx = cmd.find(";")
-                if idx != -1:
-                    cmd = cmd[idx + 1 :].strip()
-            if cmd in existing:
+            if cmd[:2] == ": ":
+                # zsh format: ": 1234567890:0;command" — one partition scan, no cmd[2:] copy
+                _, sep, rest = cmd.partition(";")
+                if sep:
+                    cmd = rest.strip()
+            key = _command_key(cmd)
+            if key in existing:
                 continue
-            existing.add(cmd)
+            existing.add(key)
             new_entries.append({
                 "type": "command",
                 "timestamp": now_iso,
                 "command": cmd,
-                "cwd": cwd_fallback or str(Path.cwd()),
+                "cwd": cwd,
             })
 
-    if not new_entries:
-        return 0
-
     logs_dir.mkdir(parents=True, exist_ok=True)
-    # Append to existing log or create new
-    try:
-        if log_path.exists():
-            data = json.loads(log_path.read_text(encoding="utf-8"))
-            if not isinstance(data, list):
-                data = []
-        else:
-            data = []
-        data.extend(new_entries)
-        log_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
-    except Exception:
-        log_path.write_text(json.dumps(new_entries, indent=2), encoding="utf-8")
+    if new_entries:
+        # Append only the new lines; the existing log is never re-read or rewritten
+        _append_log(log_path, b"".join(_encode_entry(entry) for entry in new_entries))
+    if new_cursor != cursor:
+        _cursor_path(logs_dir).write_bytes(jsonio.dumps(new_cursor))
     return len(new_entries)
 
 
+def sync_terminal_history_async(logs_dir: Path, cwd_fallback: str = "") -> Future:
+    """Run sync_terminal_history on the background logger thread. Returns its Future (result = count)."""
+    return _executor.submit(sync_terminal_history, logs_dir, cwd_fallback)
+
+
+def flush_logs_async() -> Future:
+    """Run flush_logs on the background logger thread, so fsync never blocks the caller."""
+    return _executor.submit(flush_logs)
+
+
 def load_commands_from_logs(logs_dir: Path) -> list[dict]:
-    """Load all command entries from logs/*.json for indexing."""
+    """Load all command entries from logs/device_*.msgpack, .jsonl and legacy .json for indexing."""
     if not logs_dir.exists():
         return []
     entries = []
-    for path in logs_dir.glob("device_*.json"):
+    for path in [p for suffix in _LOG_SUFFIXES for p in logs_dir.glob(f"device_*{suffix}")]:
         try:
-            data = json.loads(path.read_text(encoding="utf-8"))
-            if isinstance(data, list):
-                for item in data:
-                    if isinstance(item, dict) and item.get("type") == "command":
-                        entries.append(item)
-        except Exception:
+            for item in _iter_log_entries(path):
+                if item.get("type") == "command":
+                    entries.append(item)
+        except OSError:
             continue
     return entries
@@ -1,10 +1,11 @@
 """
 Load and validate config.json. Ensure data dir and subdirs exist.
 """
-import json
+import copy
 from pathlib import Path
 from typing import Any
 
+from . import jsonio
 from .paths import (
     get_config_path,
     get_data_dir,
@@ -23,6 +24,9 @@ DEFAULT_CONFIG: dict[str, Any] = {
     "dark_mode": False,
 }
 
+# Last parsed config keyed by (st_mtime_ns, st_size) of config.json; reset by save_config
+_CFG_CACHE: tuple[int, int, dict[str, Any]] | None = None
+
 
 def ensure_data_dirs() -> Path:
     """Create LoadsSearch/, logs/, file_index_data/, search_index/ if missing. Returns data dir."""
@@ -39,7 +43,7 @@ def ensure_config() -> Path:
     path = get_config_path()
     if not path.exists():
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(DEFAULT_CONFIG, indent=2), encoding="utf-8")
+        path.write_bytes(jsonio.dumps(DEFAULT_CONFIG, indent=True))
     return path
 
 
@@ -48,10 +52,16 @@ def load_config() -> dict[str, Any]:
     Load config.json. Ensures data dirs and config exist first.
     Validates required keys and types; fills missing optional keys from defaults.
     """
+    global _CFG_CACHE
     ensure_data_dirs()
     ensure_config()
     path = get_config_path()
-    raw = json.loads(path.read_text(encoding="utf-8"))
+    st = path.stat()
+    cache_key = (st.st_mtime_ns, st.st_size)
+    if _CFG_CACHE is not None and _CFG_CACHE[:2] == cache_key:
+        # Callers mutate the returned dict before save_config, so hand out a copy
+        return copy.deepcopy(_CFG_CACHE[2])
+    raw = jsonio.loads(path.read_bytes())
 
     # Required
     if "folders_to_index" not in raw:
@@ -75,15 +85,18 @@ def load_config() -> dict[str, Any]:
         elif key == "dark_mode":
             raw[key] = bool(raw[key]) if isinstance(raw[key], (bool, int, str)) else default
 
+    _CFG_CACHE = (*cache_key, copy.deepcopy(raw))
     return raw
 
 
 def save_config(cfg: dict[str, Any]) -> None:
     """Write config.json. Ensures data dir exists. Preserves all keys including last_indexed_iso."""
+    global _CFG_CACHE
     ensure_data_dirs()
     path = get_config_path()
     out = {k: cfg.get(k, DEFAULT_CONFIG.get(k)) for k in DEFAULT_CONFIG}
     out["folders_to_index"] = [str(p) for p in cfg.get("folders_to_index", [])]
     if cfg.get("last_indexed_iso") is not None:
         out["last_indexed_iso"] = cfg["last_indexed_iso"]
-    path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+    path.write_bytes(jsonio.dumps(out, indent=True))
+    _CFG_CACHE = None
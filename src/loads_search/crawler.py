@@ -1,7 +1,9 @@
 """
 File crawler: scan configured folders with excludes and size limits.
-Yields file metadata (path, mtime, size) for indexable text files only.
+Yields file metadata (path, mtime in ns, size) for indexable text files only.
 """
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, Iterator
 
@@ -31,47 +33,82 @@ LARGE_FILE_EXTENSIONS = frozenset({".docx", ".pdf"})
 LARGE_FILE_MAX_KB = 10 * 1024  # 10 MB for .docx, .pdf (more conservative for e-books)
 
 
+def _scan_dir(
+    top: str,
+    exclude_set: set[str],
+    max_bytes: int,
+    subdirs: list[str] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Walk one directory tree with an os.scandir stack and return its indexable files.
+    If subdirs is given, child directories are appended to it instead of being walked.
+    """
+    large_bytes = LARGE_FILE_MAX_KB * 1024
+    found: list[dict[str, Any]] = []
+    # Iterative os.scandir walk: DirEntry caches is_dir/is_file, so no extra stat per entry
+    stack = [top]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    # Prune by name before any is_dir/stat call: excluded dirs
+                    # (node_modules, .venv, ...) are never descended into
+                    if entry.name.lower() in exclude_set:
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            (stack if subdirs is None else subdirs).append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    name = entry.name
+                    dot = name.rfind(".")
+                    ext = name[dot:].lower() if dot > 0 else ""
+                    if ext not in INDEXABLE_EXTENSIONS:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    limit = large_bytes if ext in LARGE_FILE_EXTENSIONS else max_bytes
+                    if stat.st_size > limit:
+                        continue
+                    # top is already resolved, so entry.path is absolute without a per-file resolve()
+                    found.append({
+                        "path": entry.path,
+                        "mtime": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                    })
+        except (PermissionError, OSError):
+            continue
+    return found
+
+
 def crawl(
     folders: list[str],
     exclude_patterns: list[str],
     max_file_size_kb: int,
 ) -> Iterator[dict[str, Any]]:
     """
-    Walk folders and yield one dict per file: path (str), mtime (iso), size (int).
+    Walk folders and yield one dict per file: path (str), mtime (int, ns), size (int).
     Skips dirs whose name is in exclude_patterns, files over max_file_size_kb, non-indexable extensions.
+    Each top-level subdirectory is scanned on a thread pool, so results are not in walk order.
     """
     max_bytes = max_file_size_kb * 1024
     exclude_set = {p.strip().lower() for p in exclude_patterns if p}
 
-    for folder in folders:
-        root = Path(folder)
-        if not root.is_dir():
-            continue
-        try:
-            for path in root.rglob("*"):
-                if not path.is_file():
-                    continue
-                if path.suffix.lower() not in INDEXABLE_EXTENSIONS:
-                    continue
-                # Skip if any parent dir name matches exclude
-                skip = False
-                for part in path.relative_to(root).parts:
-                    if part.lower() in exclude_set:
-                        skip = True
-                        break
-                if skip:
-                    continue
-                try:
-                    stat = path.stat()
-                except OSError:
-                    continue
-                limit = LARGE_FILE_MAX_KB * 1024 if path.suffix.lower() in LARGE_FILE_EXTENSIONS else max_bytes
-                if stat.st_size > limit:
-                    continue
-                yield {
-                    "path": str(path.resolve()),
-                    "mtime": stat.st_mtime,
-                    "size": stat.st_size,
-                }
-        except (PermissionError, OSError):
-            continue
+    # Scanning is syscall-bound; overlapping many directory walks hides per-call latency
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        futures = []
+        for folder in folders:
+            root = Path(folder)
+            if not root.is_dir():
+                continue
+            root = root.resolve()
+            subdirs: list[str] = []
+            yield from _scan_dir(str(root), exclude_set, max_bytes, subdirs)
+            futures.extend(executor.submit(_scan_dir, d, exclude_set, max_bytes) for d in subdirs)
+        for future in as_completed(futures):
+            yield from future.result()
@@ -3,10 +3,12 @@ Load's Search GUI: one window, search bar, result list, open on double-click, Re
 Folder selection to choose what to index. Logo and "last indexed" from recommendations.
 """
 import base64
+import functools
 import locale
 import os
 import subprocess
 import sys
+import unicodedata
 from datetime import datetime
 from pathlib import Path
 import tkinter as tk
@@ -47,6 +49,21 @@ except ImportError:
 # Debounce search while typing
 _after_id = None
 
+# ttk style shared by all apply_theme calls (created on first call, needs a Tk root)
+_STYLE: ttk.Style | None = None
+
+# Bound once at import; do_search runs on every debounced keystroke
+_nfc = unicodedata.normalize
+
+# NFC-normalized search queries keyed by raw text (FIFO-bounded)
+_nfc_cache: Dict[str, str] = {}
+_NFC_CACHE_MAX = 256
+
+# How often the GUI logs new terminal history in the background
+HISTORY_SYNC_INTERVAL_MS = 60_000
+# How often appended activity logs are fsynced (only when something was written)
+LOG_FLUSH_INTERVAL_MS = 2_000
+
 # Dark theme colors
 DARK_THEME: Dict[str, str] = {
     'bg': '#2b2b2b',
@@ -85,9 +102,12 @@ def apply_theme(root: tk.Tk, theme: Dict[str, str]) -> None:
     # Font for Turkish character support
     turkish_font = ("Tahoma", 9) if sys.platform == "win32" else ("Segoe UI", 9)
     
-    # Configure ttk styles
-    style = ttk.Style()
-    style.theme_use('clam')
+    # Configure ttk styles: create the Style and select 'clam' once, then only recolor
+    global _STYLE
+    if _STYLE is None:
+        _STYLE = ttk.Style(root)
+        _STYLE.theme_use('clam')
+    style = _STYLE
     
     # Configure TButton style with Turkish font
     style.configure('TButton', 
@@ -153,14 +173,22 @@ def _open_folder(path: str) -> None:
         subprocess.run(["xdg-open", path_str], check=False)
 
 
+@functools.lru_cache(maxsize=64)
+def _parse_last_indexed(iso_str: str) -> datetime:
+    """Parse last_indexed_iso to a naive local datetime (cached; the string rarely changes)."""
+    dt = datetime.fromisoformat(iso_str.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
 def _format_last_indexed(iso_str: str | None) -> str:
     """Turn last_indexed_iso into 'Index from 2 hours ago' or similar."""
     if not iso_str or not iso_str.strip():
         return ""
     try:
-        dt = datetime.fromisoformat(iso_str.replace("Z", "+00:00"))
-        if dt.tzinfo is not None:
-            dt = dt.astimezone().replace(tzinfo=None)
+        # Only the parse is cached: the "ago" text depends on the current time
+        dt = _parse_last_indexed(iso_str)
         now = datetime.now()
         delta = now - dt
         secs = max(0, int(delta.total_seconds()))
@@ -190,8 +218,9 @@ def run_gui() -> None:
         )
         sys.exit(1)
 
+    from .activity_logger import flush_logs_async, sync_terminal_history_async
     from .config import load_config, save_config
-    from .paths import get_data_dir
+    from .paths import get_data_dir, get_logs_dir
     from .indexer import full_index, search_index, get_index
 
     root = tk.Tk()
@@ -337,8 +366,13 @@ def run_gui() -> None:
             q = search_var.get().strip()
             # Normalize Unicode for better Turkish character matching
             if q:
-                import unicodedata
-                q = unicodedata.normalize('NFC', q)
+                nfc = _nfc_cache.get(q)
+                if nfc is None:
+                    nfc = _nfc('NFC', q)
+                    if len(_nfc_cache) >= _NFC_CACHE_MAX:
+                        del _nfc_cache[next(iter(_nfc_cache))]
+                    _nfc_cache[q] = nfc
+                q = nfc
             
             result_data.clear()
             results_list.delete(0, tk.END)
@@ -453,6 +487,20 @@ def run_gui() -> None:
     elif get_index() is None:
         status_var.set("No index yet. Add folders above and click Re-index.")
 
+    def schedule_history_sync() -> None:
+        """Log new shell commands every minute on the logger thread; never blocks the Tk loop."""
+        if load_config().get("log_terminal_history", True):
+            sync_terminal_history_async(get_logs_dir())
+        root.after(HISTORY_SYNC_INTERVAL_MS, schedule_history_sync)
+
+    def schedule_log_flush() -> None:
+        """Batch fsync of appended activity logs instead of syncing on every write."""
+        flush_logs_async()
+        root.after(LOG_FLUSH_INTERVAL_MS, schedule_log_flush)
+
+    schedule_history_sync()
+    schedule_log_flush()
+
     root.mainloop()
 
 
@@ -1,96 +1,325 @@
 """
 Whoosh index: build and rebuild from file metadata + file contents.
-Index is local per device; rebuild from file_metadata.json when needed.
+Index is local per device; rebuild from the synced file metadata when needed.
 """
+import codecs
+import functools
+import hashlib
+import importlib
+import importlib.util
+import multiprocessing
+import os
 import shutil
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 from whoosh import index
-from whoosh.fields import ID, KEYWORD, TEXT, Schema
+from whoosh import highlight
+from whoosh.analysis import STOP_WORDS
+from whoosh.fields import ID, KEYWORD, STORED, TEXT, Schema
 from whoosh.qparser import QueryParser
 
-from .paths import get_logs_dir, get_search_index_dir
+from .crawler import INDEXABLE_EXTENSIONS
+from .paths import get_content_cache_dir, get_logs_dir, get_search_index_dir
 from .metadata import load_metadata, save_metadata
 
-# Schema: path = unique id (file path or "command:..."), result_type = "file" | "command", content = searchable text
+# Schema: path = unique id (file path or "command:..."), result_type = "file" | "command", content = searchable text.
+# content is indexed but not stored (keeps the index small); summary stores the first SUMMARY_CHARS
+# of a file, or the whole command, for snippets and copy-to-clipboard. mtime/size let build_index
+# skip files that have not changed since they were indexed. A file whose extracted text matches an
+# already indexed file is stored with empty content and dup_of = that file's path; digest is the
+# blake2b hash of the extracted text. retry marks files whose text could not be extracted for a
+# reason that may go away (see _RetryableError); they are extracted again on the next build.
 SCHEMA = Schema(
     path=ID(stored=True, unique=True),
     result_type=KEYWORD(stored=True),
-    content=TEXT(stored=True),
+    content=TEXT(stored=False),
+    summary=STORED(),
+    mtime=STORED(),
+    size=STORED(),
+    digest=STORED(),
+    dup_of=ID(stored=True),
+    retry=STORED(),
 )
 
+SUMMARY_CHARS = 400
 
-def _read_content(path_str: str, max_chars: int = 500_000) -> str:
-    """Read file as text; return empty string on error or if too large. Handles .docx and .pdf files."""
-    path = Path(path_str)
-    if not path.exists():
+
+# Extracted-text cache: zstandard when installed, else zlib (stdlib)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+if zstandard is not None:
+    _CACHE_SUFFIX = ".zst"
+    _compress = zstandard.ZstdCompressor().compress
+    _decompress = zstandard.ZstdDecompressor().decompress
+else:
+    _CACHE_SUFFIX = ".z"
+    _compress = zlib.compress
+    _decompress = zlib.decompress
+
+try:
+    from itertools import batched
+except ImportError:  # Python < 3.12
+    def batched(iterable, n):
+        it = iter(iterable)
+        while batch := tuple(islice(it, n)):
+            yield batch
+
+# Files are extracted (and handed to the writer) in batches of this many
+_EXTRACT_BATCH_SIZE = 500
+
+# Use multi-process Whoosh writers only for a new index of at least this many files
+_PARALLEL_WRITER_MIN_DOCS = 500
+
+# pdfplumber extraction is killed after this long (large e-books can hang it)
+PDF_TIMEOUT_SECONDS = 30
+
+# Least recently used cache files are deleted past this total size
+CONTENT_CACHE_MAX_MB = 512
+
+# Encoding detection looks at this many leading bytes, not the whole file
+_DETECT_SAMPLE_BYTES = 64 * 1024
+# Chunk size for incremental chardet feeding
+_DETECT_CHUNK_BYTES = 8 * 1024
+
+# Byte-order marks, checked before any statistical detection. UTF-32 first: its LE mark starts
+# with the UTF-16 LE one. The BOM-aware codecs ("utf-16", "utf-32") strip the mark when decoding.
+_BOMS = (
+    (b"\x00\x00\xfe\xff", "utf-32"),
+    (b"\xff\xfe\x00\x00", "utf-32"),
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+
+
+def _bom_encoding(head: bytes) -> str | None:
+    """Encoding named by a leading byte-order mark, if any."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def _is_utf8(head: bytes) -> bool:
+    """True if head is valid UTF-8 (a multi-byte char cut at the end of the sample is allowed)."""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+# Optional extractors/detectors, imported on first use and then kept (once per worker process).
+# None records "not installed" so a missing package is not searched for again on every file.
+_LAZY_MODULES: dict[str, Any] = {}
+
+
+def _lazy_import(name: str) -> Any:
+    """Return module name, importing it on first call; None if it is not installed."""
+    try:
+        return _LAZY_MODULES[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _LAZY_MODULES[name] = module
+    return module
+
+
+@functools.lru_cache(maxsize=None)
+def _module_available(name: str) -> bool:
+    """True if name is importable, without importing it."""
+    return importlib.util.find_spec(name) is not None
+
+
+def _detect_encoding(raw: bytes, min_confidence: float = 0.7) -> str | None:
+    """
+    Guess the encoding of raw with the best detector installed; None unless confidence > min_confidence.
+    cchardet (C++ uchardet) is ~4x faster than chardet. charset-normalizer is only a last resort:
+    it misreads short Turkish (cp1254) text as cp1250.
+    """
+    cchardet = _lazy_import("cchardet")  # provided by cchardet or faust-cchardet
+    if cchardet is not None:
+        detected = cchardet.detect(raw)
+        if detected and (detected.get('confidence') or 0) > min_confidence:
+            return detected.get('encoding')
+        return None
+    universaldetector = _lazy_import("chardet.universaldetector")
+    if universaldetector is not None:
+        # Feed in small chunks and stop once chardet is sure (plain ASCII/UTF-8 exits after the first)
+        detector = universaldetector.UniversalDetector()
+        for start in range(0, len(raw), _DETECT_CHUNK_BYTES):
+            detector.feed(raw[start:start + _DETECT_CHUNK_BYTES])
+            if detector.done:
+                break
+        detected = detector.close()
+        if detected and (detected.get('confidence') or 0) > min_confidence:
+            return detected['encoding']
+        return None
+    charset_normalizer = _lazy_import("charset_normalizer")
+    if charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(raw).best()
+        if best is not None and 1.0 - best.chaos > min_confidence:
+            return best.encoding
+        return None
+    return None
+
+
+def _extract_pdfplumber(path_str: str, max_chars: int) -> str:
+    """Extract PDF text with pdfplumber (first 50 pages, stops past max_chars)."""
+    pdfplumber = _lazy_import("pdfplumber")
+
+    text_parts = []
+    total = 0
+    with pdfplumber.open(path_str) as pdf:
+        # Limit to first 50 pages to prevent hanging on large e-books
+        max_pages = min(50, len(pdf.pages))
+        for page in pdf.pages[:max_pages]:
+            try:
+                text = page.extract_text()
+                if text and text.strip():
+                    text_parts.append(text)
+                    # Stop if we've collected enough content (running count, no re-join)
+                    total += len(text) + 1
+                    if total > max_chars:
+                        break
+            except Exception:
+                continue
+    return "\n".join(text_parts) if text_parts else ""
+
+
+def _pdfplumber_worker(conn: Any) -> None:
+    """Child-process loop: for each (path, max_chars) request send back ("success", text) or ("error", message)."""
+    try:
+        while True:
+            try:
+                path_str, max_chars = conn.recv()
+            except EOFError:
+                return
+            try:
+                conn.send(("success", _extract_pdfplumber(path_str, max_chars)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+# Long-lived pdfplumber child of this process: (process, connection). Started on the first PDF and
+# only replaced after a timeout or crash, so spawn platforms (Windows, macOS) start one interpreter
+# and import pdfplumber once per extraction worker instead of once per PDF.
+_PDF_CHILD: tuple[Any, Any] | None = None
+
+
+def _stop_pdf_child() -> None:
+    """Terminate this process's pdfplumber child, if any."""
+    global _PDF_CHILD
+    if _PDF_CHILD is None:
+        return
+    proc, conn = _PDF_CHILD
+    _PDF_CHILD = None
+    conn.close()
+    proc.terminate()
+    proc.join(1)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+
+
+def _pdf_child() -> tuple[Any, Any]:
+    """This process's pdfplumber child, started (or restarted if it died) on demand."""
+    global _PDF_CHILD
+    if _PDF_CHILD is not None and _PDF_CHILD[0].is_alive():
+        return _PDF_CHILD
+    _stop_pdf_child()
+    conn, child_conn = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=_pdfplumber_worker, args=(child_conn,), daemon=True)
+    proc.start()
+    child_conn.close()
+    _PDF_CHILD = (proc, conn)
+    return _PDF_CHILD
+
+
+def _run_pdfplumber(path_str: str, max_chars: int, timeout: float | None = None) -> tuple[str, str]:
+    """
+    Run _extract_pdfplumber in the pdfplumber child; terminate it after timeout (default PDF_TIMEOUT_SECONDS).
+    Unlike a thread, a stuck extraction is really stopped and its memory freed.
+    Returns (status, text) with status "success", "error" or "timeout".
+    """
+    _, conn = _pdf_child()
+    try:
+        conn.send((path_str, max_chars))
+        if not conn.poll(PDF_TIMEOUT_SECONDS if timeout is None else timeout):
+            _stop_pdf_child()
+            return ("timeout", "")
+        return conn.recv()
+    except (EOFError, OSError):
+        # Child died without answering (e.g. crashed inside pdfminer)
+        _stop_pdf_child()
+        return ("error", "")
+
+
+class _RetryableError(Exception):
+    """No text extracted for a reason that may go away: extractor not installed, I/O error."""
+
+
+def _read_content(path_str: str, *, size: int | None = None, max_chars: int = 500_000) -> str:
+    """
+    Read file as text; return empty string on error or if too large. Handles .docx and .pdf files.
+    Pass size (bytes, from the crawler/metadata entry) to skip the exists/stat syscalls.
+    """
+    try:
+        return _extract_text(path_str, size=size, max_chars=max_chars)
+    except _RetryableError:
         return ""
+
+
+def _extract_text(path_str: str, *, size: int | None = None, max_chars: int = 500_000) -> str:
+    """
+    _read_content, but raise _RetryableError instead of returning "" when a later attempt may
+    succeed. "" is final: no text in the file, unsupported type, too large, PDF timeout, corrupt file.
+    """
+    path = Path(path_str)
     suffix = path.suffix.lower()
+    # Same allow-list as the crawler: images, archives, binaries etc. (e.g. from an old
+    # file_metadata.json) are skipped before any I/O
+    if suffix not in INDEXABLE_EXTENSIONS:
+        return ""
+    # With a known size, skip exists(): a vanished file makes open() fail and returns ""
+    if size is None and not path.exists():
+        return ""
     
     # PDF documents: extract text with pdfplumber (primary) or PyPDF2 (fallback)
     if suffix == ".pdf":
-        # Try pdfplumber first (better encoding support)
-        try:
-            import pdfplumber
-            import threading
-            import queue
-            
-            def extract_with_timeout():
-                """Extract PDF text with timeout protection"""
-                text_parts = []
-                try:
-                    with pdfplumber.open(path_str) as pdf:
-                        # Limit to first 50 pages to prevent hanging on large e-books
-                        max_pages = min(50, len(pdf.pages))
-                        for i, page in enumerate(pdf.pages[:max_pages]):
-                            try:
-                                text = page.extract_text()
-                                if text and text.strip():
-                                    text_parts.append(text)
-                                    # Stop if we've collected enough content
-                                    if len("\n".join(text_parts)) > max_chars:
-                                        break
-                            except Exception:
-                                continue
-                except Exception as e:
-                    raise e
-                return "\n".join(text_parts) if text_parts else ""
-            
-            # Use threading timeout (works on Windows)
-            result_queue = queue.Queue()
-            def worker():
-                try:
-                    result = extract_with_timeout()
-                    result_queue.put(("success", result))
-                except Exception as e:
-                    result_queue.put(("error", str(e)))
-            
-            thread = threading.Thread(target=worker)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout=30)  # 30 second timeout
-            
-            if thread.is_alive():
-                # Thread is still running - likely stuck on a large PDF
+        # Try pdfplumber first (better encoding support), in a child process that can be killed on timeout
+        if _module_available("pdfplumber"):
+            status, result = _run_pdfplumber(path_str, max_chars)
+            if status == "timeout":
+                # Child was stuck on a large PDF; it has been terminated
                 print(f"⚠️ PDF extraction timeout for {path_str} - file too large")
                 return ""
-            
-            if not result_queue.empty():
-                status, result = result_queue.get()
-                if status == "success" and result:
-                    return result[:max_chars] if len(result) > max_chars else result
-                    
-        except ImportError:
-            pass
-        except Exception:
-            pass
+            if status == "success" and result:
+                return result[:max_chars] if len(result) > max_chars else result
         
         # Fallback to PyPDF2 with similar optimizations
+        PyPDF2 = _lazy_import("PyPDF2")
+        if PyPDF2 is None:
+            if _module_available("pdfplumber"):
+                return ""
+            raise _RetryableError("no PDF extractor installed")
         try:
-            from PyPDF2 import PdfReader
-            reader = PdfReader(path_str)
+            reader = PyPDF2.PdfReader(path_str)
             text_parts = []
+            total = 0
             
             # Limit to first 50 pages
             max_pages = min(50, len(reader.pages))
@@ -99,117 +328,300 @@ def _read_content(path_str: str, max_chars: int = 500_000) -> str:
                     page = reader.pages[i]
                     text = page.extract_text()
                     if text and text.strip():
-                        # Try to fix common Turkish character encoding issues
-                        text = text.replace('■', 'ş').replace('■', 'Ş').replace('■', 'ç').replace('■', 'Ç')
-                        text = text.replace('■', 'ğ').replace('■', 'Ğ').replace('■', 'ı').replace('■', 'İ')
-                        text = text.replace('■', 'ö').replace('■', 'Ö').replace('■', 'ü').replace('■', 'Ü')
                         text_parts.append(text)
                         
-                        # Stop if we've collected enough content
-                        if len("\n".join(text_parts)) > max_chars:
+                        # Stop if we've collected enough content (running count, no re-join)
+                        total += len(text) + 1
+                        if total > max_chars:
                             break
                 except Exception:
                     continue
             text = "\n".join(text_parts)
             return text[:max_chars] if len(text) > max_chars else text
+        except OSError as e:
+            raise _RetryableError(str(e)) from e
         except Exception:
             return ""
     
     # Word documents: extract text with python-docx
     if suffix == ".docx":
+        docx = _lazy_import("docx")
+        if docx is None:
+            raise _RetryableError("python-docx not installed")
         try:
-            from docx import Document
-            doc = Document(path_str)
+            doc = docx.Document(path_str)
             parts = [p.text for p in doc.paragraphs]
             for table in doc.tables:
                 for row in table.rows:
                     parts.append(" ".join(cell.text for cell in row.cells))
             text = "\n".join(parts)
             return text[:max_chars] if len(text) > max_chars else text
+        except OSError as e:
+            raise _RetryableError(str(e)) from e
         except Exception:
             return ""
     
-    # Plain text - use chardet for encoding detection with Turkish fallbacks
+    # Plain text - detect encoding on a head sample (BOM, then chardet) with Turkish fallbacks
     try:
-        size = path.stat().st_size
-        if size > max_chars * 2:  # rough: 2 bytes per char
+        limit = max_chars * 2  # rough: 2 bytes per char
+        if size is None:
+            size = path.stat().st_size
+        if size > limit:
             return ""
-        raw = path.read_bytes()
-        
-        # First try chardet for automatic detection
-        try:
-            import chardet
-            detected = chardet.detect(raw)
-            if detected and detected['confidence'] > 0.7:
-                encoding = detected['encoding']
-                if encoding:
-                    try:
-                        return raw.decode(encoding)
-                    except UnicodeDecodeError:
-                        pass
-        except ImportError:
-            pass
-        
-        # Fallback to common encodings with Turkish support
-        encodings = ['utf-8', 'utf-8-sig', 'windows-1254', 'iso-8859-9', 'iso-8859-1', 'cp1252']
-        
-        for encoding in encodings:
+        # One readinto() into a preallocated buffer: no read_bytes() copy, and unlike mmap no SIGBUS
+        # when the file is truncated while being read (log rotation, editors saving in place)
+        with path.open("rb") as f:
+            buf = bytearray(min(os.fstat(f.fileno()).st_size, limit))
+            got = f.readinto(buf)
+        if not got:
+            return ""
+        with memoryview(buf)[:got] as data:
+            # Detectors need bytes: copy only the sample
+            head = bytes(data[:_DETECT_SAMPLE_BYTES])
+            # Pick one encoding, then decode once: BOM > detector > UTF-8 (if the file is valid) > Turkish cp1254
+            encoding = _bom_encoding(head) or _detect_encoding(head, min_confidence=0.5)
             try:
-                return raw.decode(encoding)
-            except UnicodeDecodeError:
-                continue
-        
-        # Final fallback to utf-8 with error replacement
-        return raw.decode("utf-8", errors="replace")
-    except (OSError, UnicodeDecodeError):
+                encoding = codecs.lookup(encoding).name if encoding else None
+            except LookupError:
+                encoding = None
+            # An all-ASCII sample says nothing about the rest of the file: decide as if undetected
+            if encoding == "ascii":
+                encoding = None
+            if not encoding and not _is_utf8(head):
+                encoding = "cp1254"
+            if not encoding:
+                # UTF-8 sample: still fall back to Turkish if later bytes are not UTF-8
+                try:
+                    return codecs.decode(data, "utf-8")[:max_chars]
+                except UnicodeDecodeError:
+                    encoding = "cp1254"
+            return codecs.decode(data, encoding, "replace")[:max_chars]
+    except OSError as e:
+        raise _RetryableError(str(e)) from e
+    except UnicodeDecodeError:
         return ""
 
 
-def build_index(entries: list[dict[str, Any]], command_entries: list[dict[str, Any]] | None = None) -> int:
+def _content_cache_file(path_str: str, mtime: Any, size: Any) -> Path:
+    """Cache file for one (path, mtime, size) version of a file: content_cache/<key[:2]>/<key><suffix>."""
+    key = hashlib.blake2b(f"{path_str}\0{mtime}\0{size}".encode("utf-8", errors="replace"), digest_size=16).hexdigest()
+    return get_content_cache_dir() / key[:2] / f"{key}{_CACHE_SUFFIX}"
+
+
+def _cached_content(path_str: str, mtime: Any = None, size: Any = None) -> str:
     """
-    Build Whoosh index from file entries and optional command entries.
-    Files: list of {path, mtime, size}. Commands: list of {type, timestamp, command, cwd}.
-    Returns total number of documents indexed.
+    _extract_text, memoized on disk by (path, mtime, size) so unchanged PDFs/DOCX are not re-parsed.
+    Final empty results (empty file, image-only PDF, timeout) are cached too; _RetryableError is not.
     """
-    idx_dir = get_search_index_dir()
-    idx_dir.mkdir(parents=True, exist_ok=True)
-    if idx_dir.exists() and any(idx_dir.iterdir()):
-        shutil.rmtree(idx_dir)
-    idx_dir.mkdir(parents=True, exist_ok=True)
+    if mtime is None or size is None:
+        return _extract_text(path_str, size=size)
+    cache_file = _content_cache_file(path_str, mtime, size)
+    try:
+        text = _decompress(cache_file.read_bytes()).decode("utf-8")
+        os.utime(cache_file)  # mark as recently used for _prune_content_cache
+        return text
+    except Exception:
+        # Missing or unreadable cache entry: extract below
+        pass
+    text = _extract_text(path_str, size=int(size))
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(_compress(text.encode("utf-8")))
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass
+    return text
 
-    ix = index.create_in(str(idx_dir), SCHEMA)
-    writer = ix.writer()
-    count = 0
-    for e in entries:
-        path_str = e.get("path") or ""
-        if not path_str:
-            continue
-        content = _read_content(path_str)
+
+def _prune_content_cache(max_bytes: int = CONTENT_CACHE_MAX_MB * 1024 * 1024) -> None:
+    """Delete least recently used cache files until the content cache fits in max_bytes."""
+    cache_dir = get_content_cache_dir()
+    if not cache_dir.exists():
+        return
+    files = []
+    total = 0
+    for f in cache_dir.glob("*/*"):
         try:
-            writer.add_document(path=path_str, result_type="file", content=content or " ")
-            count += 1
-        except Exception:
+            st = f.stat()
+        except OSError:
             continue
-    # Index commands from activity logs
-    from .activity_logger import load_commands_from_logs
-    cmd_list = command_entries if command_entries is not None else load_commands_from_logs(get_logs_dir())
-    for i, c in enumerate(cmd_list):
-        cmd = (c.get("command") or "").strip()
-        if not cmd:
-            continue
-        ts = c.get("timestamp", "") or str(i)
-        doc_id = f"command:{ts}:{i}"
+        files.append((st.st_mtime, st.st_size, f))
+        total += st.st_size
+    files.sort()
+    for _, fsize, f in files:
+        if total <= max_bytes:
+            break
         try:
-            writer.add_document(path=doc_id, result_type="command", content=cmd)
-            count += 1
-        except Exception:
+            f.unlink()
+            total -= fsize
+        except OSError:
             continue
-    writer.commit()
-    return count
+
+
+def _extract_entry(entry: dict[str, Any]) -> tuple[str, bool]:
+    """Pool task: (cached content, retry) of one crawler/metadata entry; retry is True if no text was
+    extracted but a later build may succeed (also after unexpected errors)."""
+    try:
+        return _cached_content(entry["path"], entry.get("mtime"), entry.get("size")), False
+    except Exception:
+        return "", True
+
+
+def _drain_batch(batch: tuple[dict[str, Any], ...],
+                 results: Iterator[tuple[str, bool]] | None) -> Iterator[tuple[str, str, bool]]:
+    """Yield (path, content, retry) for batch from pool results; if the pool broke, extract the rest here."""
+    done = 0
+    if results is not None:
+        try:
+            for content, retry in results:
+                yield batch[done]["path"], content, retry
+                done += 1
+        except BrokenProcessPool:
+            pass
+    for e in batch[done:]:
+        yield (e["path"], *_extract_entry(e))
+
+
+def _iter_contents(entries: list[dict[str, Any]]) -> Iterator[tuple[str, str, bool]]:
+    """
+    Yield (path, content, retry) for each entry (see _extract_entry), extracting on a process pool (PDF/DOCX parsing is CPU-bound).
+    Entries go to the pool in batches of _EXTRACT_BATCH_SIZE (several files per task message); the
+    next batch is submitted before the current one is yielded, so extraction overlaps indexing
+    and at most two batches of text are held at once. If a worker dies (out of memory, crash in
+    a C extension) the pool is broken and the remaining files are extracted in this process.
+    """
+    workers = os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = None
+            for batch in batched(entries, _EXTRACT_BATCH_SIZE):
+                chunksize = max(1, len(batch) // (workers * 4))
+                try:
+                    results = executor.map(_extract_entry, batch, chunksize=chunksize)
+                except BrokenProcessPool:
+                    results = None
+                if pending is not None:
+                    yield from _drain_batch(*pending)
+                pending = (batch, results)
+            if pending is not None:
+                yield from _drain_batch(*pending)
+    finally:
+        # Started here only if the pool broke and PDFs were extracted in this process
+        _stop_pdf_child()
+
+
+def _open_or_create_index(idx_dir: Path) -> tuple[Any, bool]:
+    """Open the index in idx_dir for incremental updates, or recreate it. Returns (index, created)."""
+    idx_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        if index.exists_in(str(idx_dir)):
+            ix = index.open_dir(str(idx_dir))
+            if ix.schema.names() == SCHEMA.names():
+                return ix, False
+            ix.close()
+    except Exception:
+        pass
+    # Cold start, or an index from an older schema: rebuild from scratch
+    if any(idx_dir.iterdir()):
+        shutil.rmtree(idx_dir)
+    idx_dir.mkdir(parents=True, exist_ok=True)
+    return index.create_in(str(idx_dir), SCHEMA), True
+
+
+def build_index(entries: list[dict[str, Any]], command_entries: list[dict[str, Any]] | None = None) -> int:
+    """
+    Build or update the Whoosh index from file entries and optional command entries.
+    Files: list of {path, mtime, size}. Commands: list of {type, timestamp, command, cwd}.
+    An existing index is updated in place: files whose (mtime, size) match are skipped (unless their
+    text could not be extracted last time, e.g. a missing extractor), removed files are deleted,
+    commands are replaced.
+    Files with the same extracted text as an indexed file
+    (backups, synced copies) are added as duplicates of it instead of being tokenized again.
+    Returns total number of documents in the index.
+    """
+    ix, created = _open_or_create_index(get_search_index_dir())
+    files = {e["path"]: e for e in entries if e.get("path")}
+
+    indexed: dict[str, tuple[Any, Any]] = {}
+    retry: set[str] = set()
+    digests: dict[str, bytes] = {}
+    dup_of: dict[str, str] = {}
+    if not created:
+        with ix.searcher() as searcher:
+            for fields in searcher.all_stored_fields():
+                if fields.get("result_type") == "file":
+                    path_str = fields.get("path", "")
+                    indexed[path_str] = (fields.get("mtime"), fields.get("size"))
+                    if fields.get("digest"):
+                        digests[path_str] = fields["digest"]
+                    if fields.get("dup_of"):
+                        dup_of[path_str] = fields["dup_of"]
+                    if fields.get("retry"):
+                        retry.add(path_str)
+    # Files whose text could not be extracted last time are retried (the extractor may be installed now)
+    changed = [e for p, e in files.items() if p in retry or indexed.get(p) != (e.get("mtime"), e.get("size"))]
+    removed = indexed.keys() - files.keys()
+    stale = removed | {e["path"] for e in changed}
+    # Duplicates of a changed or removed file are redone too (one of them becomes the new original)
+    changed += [files[p] for p, orig in dup_of.items() if orig in stale and p in files and p not in stale]
+    # Content digest -> path of the unchanged original that holds the indexed text
+    seen: dict[bytes, str] = {d: p for p, d in digests.items() if p not in stale and p not in dup_of}
+
+    # Large posting buffer; per-process sub-writers (segments kept separate) only for big cold builds.
+    # multisegment never merges, so in-place updates use the merging writer (deleted docs get purged)
+    parallel = created and len(changed) >= _PARALLEL_WRITER_MIN_DOCS
+    procs = max(1, (os.cpu_count() or 1) // 2) if parallel else 1
+    writer = ix.writer(limitmb=256, procs=procs, multisegment=procs > 1)
+    # Never leave the writer (and the index lock) open: a later Re-index would hit LockError
+    try:
+        for path_str in removed:
+            writer.delete_by_term("path", path_str)
+        for path_str, content, failed in _iter_contents(changed):
+            e = files[path_str]
+            digest = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest() if content else None
+            original = seen.get(digest) if digest else None
+            try:
+                if original is not None:
+                    writer.update_document(path=path_str, result_type="file", content=" ", summary="",
+                                           mtime=e.get("mtime"), size=e.get("size"), digest=digest, dup_of=original)
+                    continue
+                if digest:
+                    seen[digest] = path_str
+                writer.update_document(path=path_str, result_type="file", content=content or " ",
+                                       summary=content[:SUMMARY_CHARS], mtime=e.get("mtime"), size=e.get("size"),
+                                       digest=digest, retry=failed)
+            except Exception:
+                continue
+        # Index commands from activity logs (cheap: replace them all)
+        from .activity_logger import load_commands_from_logs
+        cmd_list = command_entries if command_entries is not None else load_commands_from_logs(get_logs_dir())
+        if not created:
+            writer.delete_by_term("result_type", "command")
+        for i, c in enumerate(cmd_list):
+            cmd = (c.get("command") or "").strip()
+            if not cmd:
+                continue
+            ts = c.get("timestamp", "") or str(i)
+            doc_id = f"command:{ts}:{i}"
+            try:
+                writer.add_document(path=doc_id, result_type="command", content=cmd, summary=cmd)
+            except Exception:
+                continue
+        writer.commit()
+    except Exception:
+        writer.cancel()
+        raise
+    # Updated/removed documents are only marked deleted, and small-segment merging rarely purges
+    # them; once they outnumber the live ones, merge everything into one segment
+    if ix.doc_count_all() > 2 * ix.doc_count():
+        ix.optimize()
+    _prune_content_cache()
+    return ix.doc_count()
 
 
 def rebuild_index() -> int:
-    """Load file_metadata.json and build index. Returns number of documents indexed."""
+    """Load file metadata (file_metadata.msgpack or .json) and build index. Returns number of documents indexed."""
     entries = load_metadata()
     return build_index(entries)
 
@@ -220,11 +632,13 @@ def full_index(config: dict[str, Any]) -> int:
     Use this for "Re-index" or first-time index.
     """
     from .crawler import crawl
-    from .activity_logger import sync_terminal_history
+    from .activity_logger import refresh_shell_history_paths, sync_terminal_history_async
 
     if config.get("log_terminal_history", True):
         get_logs_dir().mkdir(parents=True, exist_ok=True)
-        sync_terminal_history(get_logs_dir())
+        refresh_shell_history_paths()
+        # Go through the logger thread so this never overlaps a periodic GUI sync
+        sync_terminal_history_async(get_logs_dir()).result()
 
     entries = list(crawl(
         folders=config.get("folders_to_index", []),
@@ -248,32 +662,60 @@ def get_index():
         return None
 
 
+_PARSER: QueryParser | None = None
+
+
+def _get_parser() -> QueryParser:
+    """Shared QueryParser over SCHEMA, built on first search (plugin setup is not free)."""
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = QueryParser("content", schema=SCHEMA)
+    return _PARSER
+
+
 def search_index(q: str, limit: int = 50) -> list[tuple[str, str, str, str | None]]:
     """
     Query Whoosh. Returns list of (path_or_id, snippet, result_type, copy_text).
     result_type is "file" or "command". copy_text is set for commands (for clipboard); None for files.
+    Duplicates of a matching file (see build_index) follow it with the same snippet.
     """
     q = (q or "").strip()
-    if not q:
+    # Too short or a lone stop word: would match nothing (or everything) after analysis
+    if len(q) < 2 or q.lower() in STOP_WORDS:
         return []
     ix = get_index()
     if ix is None:
         return []
     with ix.searcher() as searcher:
-        parser = QueryParser("content", schema=SCHEMA)
         try:
-            query = parser.parse(q)
+            query = _get_parser().parse(q)
         except Exception:
             return []
         results = searcher.search(query, limit=limit)
+        # Plain-text fragments around the matched terms (no HTML tags; shown in a Tk listbox)
+        results.fragmenter = highlight.ContextFragmenter(maxchars=200, surround=40)
+        results.formatter = highlight.NullFormatter()
         out = []
         for hit in results:
             path = hit.get("path") or ""
             result_type = hit.get("result_type") or "file"
-            content = hit.get("content") or ""
-            snippet = content[:200].replace("\n", " ").strip()
-            if len(content) > 200:
-                snippet += "..."
-            copy_text = content if result_type == "command" else None
+            # Indexes built before summary existed stored the full content instead
+            summary = hit.get("summary")
+            if summary is None:
+                summary = hit.get("content") or ""
+            snippet = ""
+            if summary.strip():
+                try:
+                    snippet = hit.highlights("content", text=summary, top=1).replace("\n", " ").strip()
+                except Exception:
+                    snippet = ""
+            if not snippet:
+                snippet = summary[:200].replace("\n", " ").strip()
+                if len(summary) > 200:
+                    snippet += "..."
+            copy_text = summary if result_type == "command" else None
             out.append((path, snippet, result_type, copy_text))
-        return out
+            if result_type == "file":
+                for dup in searcher.documents(dup_of=path):
+                    out.append((dup.get("path") or "", snippet, "file", None))
+        return out[:limit]
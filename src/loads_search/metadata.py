@@ -1,10 +1,15 @@
 """
-Read/write file_metadata.json (synced). Handle missing files gracefully.
+Read/write file metadata (synced). Handle missing files gracefully.
+Written as file_metadata.msgpack, columnar {"paths": [...], "mtimes": [...], "sizes": [...]}.
+Older data (file_metadata.json, a list of {path, mtime, size}) is still read.
 """
-import json
+import os
 from pathlib import Path
 from typing import Any
 
+import msgpack
+
+from . import jsonio
 from .paths import get_file_index_data_dir
 
 
@@ -12,30 +17,58 @@ def get_metadata_path() -> Path:
     return get_file_index_data_dir() / "file_metadata.json"
 
 
-def load_metadata() -> list[dict[str, Any]]:
-    """Load file_metadata.json. Returns [] if missing or invalid."""
-    path = get_metadata_path()
-    if not path.exists():
-        return []
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        if isinstance(data, list):
-            return data
-        return []
-    except (json.JSONDecodeError, OSError):
+def get_columnar_metadata_path() -> Path:
+    return get_file_index_data_dir() / "file_metadata.msgpack"
+
+
+def _load_json(path: Path) -> list[dict[str, Any]]:
+    data = jsonio.loads(path.read_bytes())
+    return data if isinstance(data, list) else []
+
+
+def _load_columnar(path: Path) -> list[dict[str, Any]]:
+    data = msgpack.unpackb(path.read_bytes(), raw=False)
+    if not isinstance(data, dict):
         return []
+    return [
+        {"path": p, "mtime": m, "size": s}
+        for p, m, s in zip(data.get("paths", []), data.get("mtimes", []), data.get("sizes", []))
+    ]
+
+
+def load_metadata() -> list[dict[str, Any]]:
+    """Load the newest readable metadata file (msgpack or json). Returns [] if missing or invalid."""
+    candidates = [(get_columnar_metadata_path(), _load_columnar), (get_metadata_path(), _load_json)]
+    existing = []
+    for path, loader in candidates:
+        try:
+            existing.append((path.stat().st_mtime_ns, path, loader))
+        except OSError:
+            continue
+    # Newest first: another device running an older version may have synced a json file
+    for _, path, loader in sorted(existing, key=lambda c: c[0], reverse=True):
+        try:
+            return loader(path)
+        except Exception:
+            continue
+    return []
+
+
+def _save_columnar(entries: list[dict[str, Any]]) -> None:
+    path = get_columnar_metadata_path()
+    # Columns instead of per-row dicts: keys are not repeated per file and unpacking is one C call.
+    # Normalize: path as str, mtime as int (ns, from the crawler), size as int.
+    data = {
+        "paths": [str(e.get("path", "")) for e in entries],
+        "mtimes": [int(e.get("mtime", 0)) for e in entries],
+        "sizes": [int(e.get("size", 0)) for e in entries],
+    }
+    tmp = path.with_suffix(".msgpack.tmp")
+    tmp.write_bytes(msgpack.packb(data))
+    os.replace(tmp, path)
 
 
 def save_metadata(entries: list[dict[str, Any]]) -> None:
-    """Write file_metadata.json. Ensures dir exists."""
+    """Write file metadata (file_metadata.msgpack). Ensures dir exists."""
     get_file_index_data_dir().mkdir(parents=True, exist_ok=True)
-    path = get_metadata_path()
-    # Normalize: path as str, mtime as number, size as int
-    out = []
-    for e in entries:
-        out.append({
-            "path": str(e.get("path", "")),
-            "mtime": float(e.get("mtime", 0)),
-            "size": int(e.get("size", 0)),
-        })
-    path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+    _save_columnar(entries)
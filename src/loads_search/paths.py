@@ -1,11 +1,14 @@
 """
 Resolve the LoadsSearch data folder and subpaths.
 Uses environment variable LOADS_SEARCH_DATA or default in user home.
+Results are cached for the process lifetime; call _clear_caches() after changing LOADS_SEARCH_DATA.
 """
+import functools
 import os
 from pathlib import Path
 
 
+@functools.lru_cache(maxsize=1)
 def get_data_dir() -> Path:
     """Root data directory (synced via Syncthing)."""
     env = os.environ.get("LOADS_SEARCH_DATA")
@@ -15,21 +18,38 @@ def get_data_dir() -> Path:
     return home / "LoadsSearch"
 
 
+@functools.lru_cache(maxsize=1)
 def get_logs_dir() -> Path:
     """logs/ — raw activity logs (synced)."""
     return get_data_dir() / "logs"
 
 
+@functools.lru_cache(maxsize=1)
 def get_file_index_data_dir() -> Path:
     """file_index_data/ — metadata about scanned files (synced)."""
     return get_data_dir() / "file_index_data"
 
 
+@functools.lru_cache(maxsize=1)
 def get_search_index_dir() -> Path:
     """search_index/ — Whoosh index (local only, not synced)."""
     return get_data_dir() / "search_index"
 
 
+@functools.lru_cache(maxsize=1)
+def get_content_cache_dir() -> Path:
+    """content_cache/ — extracted text of indexed files (local only, not synced)."""
+    return get_data_dir() / "content_cache"
+
+
+@functools.lru_cache(maxsize=1)
 def get_config_path() -> Path:
     """config.json path."""
     return get_data_dir() / "config.json"
+
+
+def _clear_caches() -> None:
+    """Forget cached paths (e.g. after LOADS_SEARCH_DATA changes)."""
+    for fn in (get_data_dir, get_logs_dir, get_file_index_data_dir, get_search_index_dir,
+               get_content_cache_dir, get_config_path):
+        fn.cache_clear()